@@ -0,0 +1,776 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Monster FX engine.
+
+    python bench.py                 # run everything
+    python bench.py storage -n 200000
+    python bench.py ruin --paths 1000000 --trades 250
+    python bench.py stress --seconds 30
+    python bench.py startup -n 1000000
+    python bench.py records -n 1000000
+    python bench.py sse --url http://127.0.0.1:8000 --streams 500
+    python bench.py table -n 50000
+
+The sse benchmark is a load generator against a running server (e.g.
+``gunicorn -k gevent app:app``); it is skipped unless --url is given. The table benchmark needs node.
+"""
+
+import argparse, json, os, random, selectors, shutil, socket, subprocess, sys, tempfile, threading, time, tracemalloc
+import http.client
+from urllib.parse import urlsplit
+from datetime import datetime, timezone
+
+os.environ.setdefault("MFX_STORAGE", "memory")   # keep app import from touching a real journal
+import app
+
+PAIRS = list(app.PAIR_FLAGS)
+BENCHES = {}
+
+
+def bench(fn):
+    BENCHES[fn.__name__.replace("bench_", "")] = fn
+    return fn
+
+
+def fake_trade(i, rng):
+    entry = round(rng.uniform(0.6, 190), 4)
+    result = rng.choices(["WIN", "LOSS", "PENDING"], [55, 40, 5])[0]
+    pnl_pct = None if result == "PENDING" else round(rng.uniform(5, 60) * (1 if result == "WIN" else -1), 2)
+    return {
+        "id": i + 1, "pair": rng.choice(PAIRS), "dir": rng.choice(["BUY", "SELL"]),
+        "entry": entry, "tp": round(entry * 1.002, 4), "sl": round(entry * 0.998, 4),
+        "lev": 250.0, "conf": rng.randint(40, 90), "setup": "bench", "alloc": 10,
+        "result": result, "pnlPct": pnl_pct,
+        "pnlAmt": None if pnl_pct is None else round(pnl_pct / 100, 4),
+        "capitalAfter": None, "time": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def report(label, n, seconds):
+    rate = n / seconds if seconds else float("inf")
+    print(f"  {label:<34} {n:>9,} in {seconds:8.3f}s  {rate:>12,.0f}/s  {seconds / n * 1e3:9.3f} ms each")
+
+
+@bench
+def bench_storage(args):
+    """Insert/read throughput of each storage backend."""
+    n = args.n
+    rng = random.Random(1)
+    rows = [fake_trade(i, rng) for i in range(n)]
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind in ("memory", "sqlite"):
+            print(f"[storage:{kind}]")
+            backend = app.open_backend(kind, os.path.join(tmp, "bench.db"))
+            batch = rows[: min(n, 5000)]
+            t = time.perf_counter()
+            for row in batch:                       # one transaction per trade, like POST /api/trades
+                with backend.transaction():
+                    backend.insert(row)
+            report("insert (txn per trade)", len(batch), time.perf_counter() - t)
+            t = time.perf_counter()
+            with backend.transaction():
+                for row in rows[len(batch):]:
+                    backend.insert(row)
+            report("insert (single txn)", n - len(batch), time.perf_counter() - t)
+            t = time.perf_counter()
+            loaded = backend.trades()
+            report("read all", len(loaded), time.perf_counter() - t)
+            ids = rng.sample(range(1, n + 1), min(n, 10000))
+            t = time.perf_counter()
+            for i in ids:
+                backend.get(i)
+            report("point get", len(ids), time.perf_counter() - t)
+            t = time.perf_counter()
+            for _ in range(100):
+                backend.realized_pnl()
+            report("realized_pnl", 100, time.perf_counter() - t)
+            if hasattr(backend, "close"):
+                backend.close()
+
+
+@bench
+def bench_ledger(args):
+    """Capital-before-trade-k after a mid-journal PATCH: Fenwick vs rescanning older trades."""
+    rng = random.Random(2)
+    for size in (10_000, 100_000, 1_000_000):
+        print(f"[ledger:{size:,}]")
+        pnl = [rng.uniform(-5, 5) for _ in range(size)]
+        t = time.perf_counter()
+        tree = app.Fenwick(pnl)
+        report("build", size, time.perf_counter() - t)
+        t = time.perf_counter()
+        for v in pnl[:10_000]:
+            tree.append(v)
+        report("append", 10_000, time.perf_counter() - t)
+        probes = [rng.randrange(size) for _ in range(1000)]
+        t = time.perf_counter()
+        for k in probes:
+            tree.set(k, -pnl[k])
+            tree.prefix(k)
+        report("patch + capital before (fenwick)", len(probes), time.perf_counter() - t)
+        probes = probes[:20]
+        t = time.perf_counter()
+        for k in probes:
+            pnl[k] = -pnl[k]
+            sum(pnl[:k])
+        report("patch + capital before (rescan)", len(probes), time.perf_counter() - t)
+
+
+@bench
+def bench_bulk(args):
+    """POST /api/trades/bulk's import path: exportCSV-shaped CSV (newest first) into a fresh SQLite journal."""
+    n = args.n
+    rng = random.Random(3)
+    header = "#,Pair,Dir,Entry,TP,SL,Leverage,Confidence,Alloc%,Result,PnL%,PnL_Amt,Capital_After,Setup,Time\n"
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "journal.csv")
+        with open(path, "w") as f:
+            f.write(header)
+            for i in range(n, 0, -1):
+                t = fake_trade(i, rng)
+                f.write(f"{i},{t['pair']},{t['dir']},{t['entry']},{t['tp']},{t['sl']},{t['lev']},{t['conf']},"
+                        f"{t['alloc']},{t['result']},{t['pnlPct'] or ''},{t['pnlAmt'] or ''},,\"{t['setup']}\",{t['time']}\n")
+        print(f"[bulk:{n:,}]")
+        journal = app.Journal(app.open_backend("sqlite", os.path.join(tmp, "bulk.db")))
+        with open(path, "rb") as f:
+            t = time.perf_counter()
+            summary = app.bulk_import(journal, app.read_csv(f), newest_first=True)
+            report("csv import (pnl + capital + commit)", summary["imported"], time.perf_counter() - t)
+        journal.backend.close()
+
+
+@bench
+def bench_export(args):
+    """Streaming exports: throughput and peak memory held while producing the whole file."""
+    n = args.n
+    rng = random.Random(6)
+    with app.JOURNAL.writing() as j:
+        j.clear()
+        j.insert_many([fake_trade(i, rng) for i in range(n)])
+    print(f"[export:{n:,}]")
+    for label, make in (("export.csv", app.journal_csv), ("export.json", app.journal_json),
+                        ("export/model.csv", app.model_csv)):
+        t = time.perf_counter()
+        size = sum(len(chunk) for chunk in make(app.JOURNAL))
+        report(label, n, time.perf_counter() - t)
+        tracemalloc.start()                     # second pass: tracing slows it down too much to time
+        for _ in make(app.JOURNAL):
+            pass
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"  {'':<34} {size / 1e6:9.1f} MB out, peak {peak / 1e6:.1f} MB held")
+
+
+@bench
+def bench_records(args):
+    """Bytes per trade held by Trade records vs the plain dicts they replaced, as decoded from a snapshot."""
+    import marshal
+    n = args.n
+    rng = random.Random(14)
+    blob = marshal.dumps([tuple(fake_trade(i, rng)[f] for f in app.TRADE_FIELDS) for i in range(n)])
+    print(f"[records:{n:,}]")
+    sizes = {}
+    for label, build in (("dict", lambda rows: [dict(zip(app.TRADE_FIELDS, r)) for r in rows]),
+                         ("Trade", lambda rows: [app.Trade(*r) for r in rows])):
+        t = time.perf_counter()
+        with app._gc_paused():                  # as the app's loaders do; dicts of plain values aren't tracked anyway
+            build(marshal.loads(blob))
+        report(f"build: {label}", n, time.perf_counter() - t)
+        tracemalloc.start()                     # second pass: tracing slows it down too much to time
+        rows = marshal.loads(blob)
+        records = build(rows)
+        del rows                                # what's left is what the records keep alive
+        sizes[label] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del records
+        print(f"  {'':<34} {sizes[label] / n:9.0f} B/trade, {sizes[label] / 1e6:.1f} MB")
+    print(f"  {'':<34} Trade holds {sizes['Trade'] / sizes['dict']:.0%} of the dict footprint")
+
+
+def _dict_loop_stats(trades, start):
+    """GET /api/stats as it was: several passes over the list of trade dicts, newest first."""
+    closed = [t for t in trades if t.get("result") != "PENDING"]
+    wins = [t for t in closed if t.get("result") == "WIN"]
+    losses = [t for t in closed if t.get("result") == "LOSS"]
+    pending = [t for t in trades if t.get("result") == "PENDING"]
+    sorted_closed = sorted([t for t in closed if t.get("pnlPct") is not None], key=lambda x: x["pnlPct"])
+    best = sorted_closed[-1] if sorted_closed else None
+    worst = sorted_closed[0] if sorted_closed else None
+    equity, run = [start], start
+    for t in reversed(closed):
+        if t.get("pnlAmt") is not None:
+            run += t["pnlAmt"]
+            equity.append(round(run, 2))
+    pair_perf = {}
+    for t in closed:
+        p = pair_perf.setdefault(t["pair"], {"wins": 0, "losses": 0, "pnl": 0})
+        p["pnl"] += t.get("pnlPct") or 0
+        p["wins" if t.get("result") == "WIN" else "losses"] += 1
+    return {
+        "total": len(trades), "wins": len(wins), "losses": len(losses), "pending": len(pending),
+        "win_rate": round(len(wins) / len(closed) * 100) if closed else 0,
+        "net_pnl": round(sum(t.get("pnlPct") or 0 for t in closed), 2),
+        "avg_conf": round(sum(t.get("conf") or 0 for t in trades) / len(trades)) if trades else 0,
+        "best": best and {"pnl": best["pnlPct"], "pair": best["pair"]},
+        "worst": worst and {"pnl": worst["pnlPct"], "pair": worst["pair"]},
+        "equity_curve": equity, "pair_performance": pair_perf, "starting_capital": start,
+    }
+
+
+@bench
+def bench_stats(args):
+    """/api/stats on a big journal: the old dict loop vs the columnar rebuild vs the incremental path."""
+    n = args.n
+    rng = random.Random(7)
+    journal = app.Journal(app.open_backend("memory"))
+    rows = [fake_trade(i, rng) for i in range(n)]
+    with journal.writing() as j:
+        j.insert_many(rows)
+    newest_first = list(reversed(rows))
+    view = journal.published
+    start = view.ledger.start
+    print(f"[stats:{n:,}]")
+    reps = 5
+    t = time.perf_counter()
+    for _ in range(reps):
+        _dict_loop_stats(newest_first, start)
+    report("dict loop (per poll, before)", reps, time.perf_counter() - t)
+    t = time.perf_counter()
+    for _ in range(reps):
+        cols = app.TradeColumns(view.repo)
+    report("columnar mirror build", reps, time.perf_counter() - t)
+    t = time.perf_counter()
+    for _ in range(reps):
+        app.StatsAggregator.from_columns(cols, start).payload(view.capital(), cols, view.repo.by_id)
+    report("vectorized full recompute", reps, time.perf_counter() - t)
+    reps = 200
+    t = time.perf_counter()
+    for i in range(reps):                       # a write then a poll: what the dashboard does
+        with journal.writing() as j:
+            row = fake_trade(n + i, rng)
+            row["id"] = j.next_id()
+            j.insert(row)
+        journal.stats_payload()
+    report("insert + incremental stats", reps, time.perf_counter() - t)
+
+
+@bench
+def bench_equity(args):
+    """/api/stats payload with the full equity curve vs an LTTB downsample."""
+    n = args.n
+    rng = random.Random(8)
+    journal = app.Journal(app.open_backend("memory"))
+    with journal.writing() as j:
+        j.insert_many([fake_trade(i, rng) for i in range(n)])
+    print(f"[equity:{n:,}]")
+    t = time.perf_counter()
+    full = json.dumps(journal.stats_payload())
+    report("stats, full curve (build + json)", 1, time.perf_counter() - t)
+    for points in (1000, 200):
+        journal.published._equity_cache = (None, {})
+        t = time.perf_counter()
+        small = json.dumps(journal.stats_payload(points))
+        report(f"stats, {points} points (first call)", 1, time.perf_counter() - t)
+        t = time.perf_counter()
+        for _ in range(100):
+            journal.stats_payload(points)
+        report(f"stats, {points} points (cached)", 100, time.perf_counter() - t)
+        print(f"  {'':<34} {len(full) / 1e6:9.2f} MB -> {len(small) / 1e3:.1f} kB")
+
+
+@bench
+def bench_drawdown(args):
+    """/api/analytics/drawdown: the full vectorized fold vs keeping it up to date per appended trade."""
+    n = args.n
+    rng = random.Random(10)
+    journal = app.Journal(app.open_backend("memory"))
+    with journal.writing() as j:
+        j.insert_many([fake_trade(i, rng) for i in range(n)])
+    print(f"[drawdown:{n:,}]")
+    t = time.perf_counter()
+    view = journal.published
+    app.DrawdownTracker.from_columns(view.columns, view.ledger.start)
+    report("full pass (from columns)", 1, time.perf_counter() - t)
+    extra = [fake_trade(n + i, rng) for i in range(1100)]
+    t = time.perf_counter()
+    for trade in extra[:1000]:
+        with journal.writing() as j:
+            j.insert(trade)
+        with journal.reading() as view:
+            view.drawdown.payload(view.columns)
+    report("insert + figures (incremental)", 1000, time.perf_counter() - t)
+    t = time.perf_counter()
+    for trade in extra[1000:]:
+        with journal.writing() as j:
+            j.insert(trade)
+        journal.drawdown_payload(app.EQUITY_POINTS)
+    report(f"insert + figures + {app.EQUITY_POINTS}pt underwater", 100, time.perf_counter() - t)
+    for order in ("shuffled", "newest first"):
+        _check_drawdown(order, min(n, 3000))
+        print(f"  {order + ' times':<34} incremental == rebuilt")
+
+
+def _check_drawdown(order, n):
+    """Feed trades one insert at a time (the incremental path) with out-of-order times, then
+    compare against a full rebuild over the same columns; bulk imports allow any time order."""
+    rng = random.Random(12)
+    trades = [fake_trade(i, rng) for i in range(n)]
+    seconds = [rng.randrange(10 ** 8) for _ in trades]
+    if order == "newest first":
+        seconds.sort(reverse=True)
+    for trade, s in zip(trades, seconds):
+        trade["time"] = datetime.fromtimestamp(1.7e9 + s, timezone.utc).isoformat()
+    journal = app.Journal(app.open_backend("memory"))
+    for trade in trades:
+        with journal.writing() as j:
+            j.insert(trade)
+    with journal.reading() as view:
+        assert not view.drawdown.stale
+        rebuilt = app.DrawdownTracker.from_columns(view.columns, view.ledger.start)
+        incremental, full = view.drawdown.payload(view.columns), rebuilt.payload(view.columns)
+        assert incremental == full, (order, incremental, full)
+        assert full["recovery"]["avg_seconds"] >= 0 and full["recovery"]["max_seconds"] >= 0, full["recovery"]
+        assert all(abs(a - b) < 1e-9 for a, b in zip(view.drawdown.under, rebuilt.under)), order
+
+
+@bench
+def bench_rollups(args):
+    """/api/rollups: materializing a view, a one-year query, and keeping it current per insert."""
+    n = args.n
+    rng = random.Random(11)
+    end = datetime.now(timezone.utc).timestamp()
+    span = 3 * 365 * 86400      # three years of trades, oldest first
+    trades = []
+    for i in range(n):
+        trade = fake_trade(i, rng)
+        trade["time"] = datetime.fromtimestamp(end - span + span * i / n, timezone.utc).isoformat()
+        trades.append(trade)
+    journal = app.Journal(app.open_backend("memory"))
+    with journal.writing() as j:
+        j.insert_many(trades)
+    print(f"[rollups:{n:,} over 3 years]")
+    for bucket, tz in (("day", "UTC"), ("week", "America/New_York"), ("month", "Europe/London")):
+        t = time.perf_counter()
+        journal.rollup(bucket, tz)
+        report(f"build {bucket} / {tz}", 1, time.perf_counter() - t)
+    since = end - 365 * 86400
+    t = time.perf_counter()
+    for _ in range(100):
+        journal.rollup("day", "UTC", since=since)
+    report("one-year daily query", 100, time.perf_counter() - t)
+    extra = [fake_trade(n + i, rng) for i in range(1000)]
+    t = time.perf_counter()
+    for trade in extra:
+        with journal.writing() as j:
+            j.insert(trade)
+        journal.rollup("day", "UTC", since=since)
+    report("insert + one-year query (3 views)", 1000, time.perf_counter() - t)
+
+
+@bench
+def bench_accounts(args):
+    """Accounts: concurrent writers on separate shards vs one shared journal, memory per account, evict and reload."""
+    import threading
+    writers, per = 8, 250
+    rng = random.Random(12)
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = app.AccountRegistry(os.path.join(tmp, "accounts"), "sqlite", live=writers)
+        for w in range(writers):
+            registry.create(f"acct{w}")
+        shared = app.Journal(app.open_backend("sqlite", os.path.join(tmp, "shared.db")))
+        print(f"[accounts:{writers} writers x {per} inserts, sqlite]")
+
+        def write(journal, offset):
+            for i in range(per):
+                with journal.writing() as j:
+                    j.insert(dict(fake_trade(offset + i, rng), id=j.next_id()))
+            journal.backend.release()
+
+        for label, target in (("one shared journal", lambda w: shared),
+                              ("one account per writer", lambda w: registry.checkout(f"acct{w}"))):
+            threads = [threading.Thread(target=write, args=(target(w), w * per)) for w in range(writers)]
+            t = time.perf_counter()
+            for th in threads:
+                th.start()
+            for th in threads:
+                th.join()
+            report(label, writers * per, time.perf_counter() - t)
+        for w in range(writers):
+            registry.checkin(f"acct{w}")
+
+        journal = registry.checkout("acct0")
+        with journal.writing() as j:
+            j.insert_many([fake_trade(i, rng) for i in range(args.n)])
+        with journal.reading():
+            memory = journal.memory()
+        registry.checkin("acct0")
+        print(f"  memory at {args.n + per:,} trades: {memory['total'] / 1e6:.1f} MB "
+              f"({memory['total'] / (args.n + per):.0f} B/trade; trades {memory['trades'] / 1e6:.1f} MB, "
+              f"columns {memory['columns'] / 1e6:.1f} MB)")
+        registry.live = 0
+        t = time.perf_counter()
+        registry._evict()
+        report("evict", 1, time.perf_counter() - t)
+        t = time.perf_counter()
+        registry.checkout("acct0").capital()
+        report("reload + first read", 1, time.perf_counter() - t)
+        registry.checkin("acct0")
+        shared.backend.close()
+
+
+@bench
+def bench_startup(args):
+    """Log storage: restart from snapshot + log tail vs replaying the whole log, and the first read after it."""
+    n, tail = args.n, 1000
+    rng = random.Random(13)
+    rows = [fake_trade(i, rng) for i in range(n)]
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"[startup:{n:,} trades + {tail:,} logged events]")
+        for label, snapshot in (("snapshot + tail", True), ("whole log", False)):
+            path = os.path.join(tmp, f"{'snap' if snapshot else 'full'}.db")
+            every, app.LOG_SNAPSHOT_EVERY = app.LOG_SNAPSHOT_EVERY, float("inf")
+            try:
+                backend = app.open_backend("log", path)
+                for i in range(0, n, app.BULK_BATCH):
+                    with backend.transaction():
+                        backend.insert_many(rows[i:i + app.BULK_BATCH])
+                if snapshot:
+                    backend.checkpoint()
+                t = time.perf_counter()
+                for i in range(tail):
+                    with backend.transaction():
+                        backend.insert(dict(fake_trade(n + i, rng)))
+                if snapshot:
+                    report("logged single inserts", tail, time.perf_counter() - t)
+                backend.close()
+            finally:
+                app.LOG_SNAPSHOT_EVERY = every
+            t = time.perf_counter()
+            backend = app.open_backend("log", path)
+            report(f"open: {label}", 1, time.perf_counter() - t)
+            if snapshot:
+                size = sum(os.path.getsize(os.path.join(backend.root, f)) for f in os.listdir(backend.root))
+                t = time.perf_counter()
+                app.Journal(backend).capital()
+                report("first read (indexes built)", 1, time.perf_counter() - t)
+                print(f"  on disk: {size / 1e6:.1f} MB")
+            assert len(backend.rows) == n + tail
+            backend.close()
+
+
+def _check_view(view, last_version, full):
+    """Invariants any published view must hold, whatever the writers are doing."""
+    assert view.version is not None and view.version >= last_version, (view.version, last_version)
+    ledger = view.ledger
+    assert abs(ledger.tree.prefix(len(ledger.tree)) - ledger.realized) < 1e-6, "prefix sums disagree with the running total"
+    assert view.stats.total == len(view.repo), (view.stats.total, len(view.repo))
+    stats = view.stats_payload()
+    assert stats["version"] == view.version
+    assert stats["wins"] + stats["losses"] + stats["pending"] == stats["total"] == view.count(), stats
+    trades, _ = view.page(50)
+    for newer, older in zip(trades, trades[1:]):
+        expect = view.capital_before(older["id"]) + app._realized(view.get(older["id"]))
+        assert abs(view.capital_before(newer["id"]) - expect) < 1e-6, (older["id"], newer["id"])
+    if full:
+        realized = sum(app._realized(t) for t in view.repo.oldest())
+        assert abs(realized - ledger.realized) < 1e-6, (realized, ledger.realized)
+    return view.version
+
+
+@bench
+def bench_stress(args):
+    """Concurrent writers and lock-free readers; every read checks the view's invariants (fails loudly)."""
+    rng = random.Random(13)
+    switch = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)         # switch threads often, to interleave as much as possible
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            shared = os.path.join(tmp, "stress.db")
+            for label, journals in (("memory", [app.Journal(app.open_backend("memory"))]),
+                                    ("sqlite, 2 journals on 1 file", [app.Journal(app.open_backend("sqlite", shared)),
+                                                                     app.Journal(app.open_backend("sqlite", shared))])):
+                with journals[0].writing() as j:
+                    j.insert_many([fake_trade(i, rng) for i in range(min(args.n, 20_000))])
+                _stress(label, journals, args.seconds)
+    finally:
+        sys.setswitchinterval(switch)
+
+
+def _stress(label, journals, seconds):
+    stop = threading.Event()
+    counts, errors = {"reads": 0, "writes": 0}, []
+
+    def writer(journal, seed):
+        rng = random.Random(seed)
+        try:
+            while not stop.is_set():
+                op = rng.random()
+                with journal.writing() as j:
+                    ids = j.standby.repo.ids
+                    if op < 0.5 or not ids:
+                        j.insert(dict(fake_trade(0, rng), id=j.next_id()))
+                    elif op < 0.95:
+                        trade = j.get(rng.choice(ids))
+                        if trade is None:
+                            continue
+                        if op < 0.75:
+                            result = rng.choice(["WIN", "LOSS", "PENDING"])
+                            pnl = None if result == "PENDING" else round(rng.uniform(-1, 1), 4)
+                            j.update(dict(trade, result=result, pnlAmt=pnl, pnlPct=None if pnl is None else pnl * 100))
+                        else:
+                            j.delete(trade["id"])
+                    else:
+                        first = j.next_id()
+                        j.insert_many([fake_trade(first + i - 1, rng) for i in range(100)])
+                counts["writes"] += 1
+                journal.backend.release()
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    def reader(journal, seed):
+        rng, last, n = random.Random(seed), 0, 0
+        try:
+            while not stop.is_set():
+                with journal.reading() as view:
+                    last = _check_view(view, last, full=n % 1000 == 0)
+                    if rng.random() < 0.1:
+                        dash = view.dashboard(20, equity_points=100)
+                        assert dash["current_capital"] == view.capital() and dash["stats"]["version"] == view.version
+                n += 1
+                counts["reads"] += 1
+                journal.backend.release()
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    threads = [threading.Thread(target=writer, args=(journals[i % len(journals)], i)) for i in range(4)]
+    threads += [threading.Thread(target=reader, args=(journals[i % len(journals)], 100 + i)) for i in range(8)]
+    print(f"[stress:{label}, 4 writers, 8 readers, {seconds}s]")
+    t = time.perf_counter()
+    for th in threads:
+        th.start()
+    stop.wait(seconds)
+    stop.set()
+    for th in threads:
+        th.join()
+    elapsed = time.perf_counter() - t
+    if errors:
+        raise errors[0]
+    report("writes", counts["writes"], elapsed)
+    report("reads (each fully checked)", counts["reads"], elapsed)
+    backend = journals[0].backend
+    for journal in journals:
+        for _ in range(2):              # empty writes: catch up with the other journal, then level the standby
+            with journal.writing():
+                pass
+        a, b = journal.views
+        assert a.version == b.version == backend.version(), (a.version, b.version, backend.version())
+        assert a.repo.ids == b.repo.ids and list(a.repo.by_id) == list(b.repo.by_id)
+        assert a.ledger.realized == b.ledger.realized and a.stats_payload() == b.stats_payload()
+        assert [t["id"] for t in a.repo.oldest()] == [t["id"] for t in backend.trades()]
+        assert abs(a.ledger.realized - backend.realized_pnl()) < 1e-6
+        _check_view(a, 0, full=True)
+        backend.release()
+    print(f"  {'':<34} invariants held; both views match each other and the backend")
+
+
+@bench
+def bench_ruin(args):
+    """/api/risk/ruin's simulator: bootstrapped equity paths per second, inline and over a process pool."""
+    rng = random.Random(9)
+    journal = app.Journal(app.open_backend("memory"))
+    with journal.writing() as j:
+        j.insert_many([fake_trade(i, rng) for i in range(min(args.n, 10_000))])
+    moves = journal.trade_moves()
+    workers = os.cpu_count() or 1
+    print(f"[ruin:{args.paths:,} paths x {args.trades} trades, {len(moves):,} trade sample]")
+    for procs in sorted({1, workers}):
+        app.SIM_WORKERS, app._sim_pool = procs, None
+        app.ruin_risk(moves, 10, 250, args.trades, app.SIM_CHUNK * procs, 0.5, 0.1, 0.5, seed=0)   # warm the pool
+        tracemalloc.start()
+        t = time.perf_counter()
+        result = app.ruin_risk(moves, 10, 250, args.trades, args.paths, 0.5, 0.1, 0.5, seed=1)
+        seconds = time.perf_counter() - t
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        report(f"paths ({procs} process{'es' if procs > 1 else ''})", args.paths, seconds)
+        print(f"  {'':<34} p_ruin {result['p_ruin']:.4f}  p_drawdown {result['p_drawdown']:.4f}  "
+              f"peak {peak / 1e6:.1f} MB in this process")
+    app.SIM_WORKERS, app._sim_pool = 0, None
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else float("nan")
+
+
+@bench
+def bench_sse(args):
+    """Hold many /api/stream connections open and time how fast a POST reaches all of them."""
+    if not args.url:
+        print("[sse] skipped (needs --url of a running server)")
+        return
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    sel = selectors.DefaultSelector()
+    buffers = {}
+    request = f"GET /api/stream HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n".encode()
+    t = time.perf_counter()
+    for _ in range(args.streams):                 # one thread, non-blocking sockets
+        sock = socket.create_connection((host, port))
+        sock.sendall(request)
+        sock.setblocking(False)
+        sel.register(sock, selectors.EVENT_READ)
+        buffers[sock] = b""
+    print(f"[sse:{args.streams} streams]")
+    report("connect", args.streams, time.perf_counter() - t)
+
+    def drain(deadline, want):
+        """Read until every stream has seen a frame for version ``want``; returns per-stream arrival times."""
+        arrived = {}
+        while len(arrived) < len(buffers) and time.perf_counter() < deadline:
+            for key, _ in sel.select(timeout=0.5):
+                sock = key.fileobj
+                chunk = sock.recv(65536)
+                if not chunk:
+                    sel.unregister(sock)
+                    del buffers[sock]
+                    continue
+                buffers[sock] += chunk
+                while b"\n\n" in buffers[sock]:
+                    frame, buffers[sock] = buffers[sock].split(b"\n\n", 1)
+                    if want is not None and f"id: {want}\n".encode() in frame:
+                        arrived.setdefault(sock, time.perf_counter())
+        return arrived
+
+    drain(time.perf_counter() + 2, None)          # swallow response headers and the retry hint
+    rng = random.Random(4)
+    latencies, missed = [], 0
+    for i in range(args.events):
+        trade = fake_trade(i, rng)
+        body = json.dumps({k: trade[k] for k in ("pair", "dir", "entry", "tp", "sl", "lev", "conf", "result")})
+        conn = http.client.HTTPConnection(host, port)
+        sent = time.perf_counter()
+        conn.request("POST", "/api/trades", body, {"Content-Type": "application/json"})
+        conn.getresponse().read()
+        conn.request("GET", "/api/stats")
+        version = json.loads(conn.getresponse().read())["version"]
+        conn.close()
+        arrived = drain(time.perf_counter() + 10, version)
+        latencies += [at - sent for at in arrived.values()]
+        missed += len(buffers) - len(arrived)
+    print(f"  delivered {len(latencies):,} frames to {len(buffers):,} open streams, {missed} missed")
+    print(f"  POST -> frame latency  p50 {_percentile(latencies, 0.5) * 1000:7.1f} ms"
+          f"  p99 {_percentile(latencies, 0.99) * 1000:7.1f} ms  max {max(latencies, default=0) * 1000:7.1f} ms")
+    for sock in list(buffers):
+        sock.close()
+
+
+# A DOM just deep enough for the shell's table code: a node list per element and
+# a count of the mutations a browser would have to lay out. innerHTML is stored,
+# not parsed, so the timings are the script's share of a frame only.
+TABLE_DOM = r"""
+const ops = { rewrites: 0, inserts: 0, removes: 0 };
+class El {
+  constructor() { this.children = []; this.parentNode = null; this.style = {}; this.className = ''; this.html = ''; }
+  get firstChild() { return this.children[0] || null; }
+  get nextSibling() { const s = this.parentNode.children; return s[s.indexOf(this) + 1] || null; }
+  set innerHTML(html) { ops.rewrites++; this.html = html; this.children = [new El()]; this.children[0].parentNode = this; }
+  set textContent(_) { this.children = []; }
+  append(...els) { for (const el of els) this.insertBefore(el, null); }
+  insertBefore(el, ref) {
+    ops.inserts++;
+    if (el.parentNode) { const s = el.parentNode.children; s.splice(s.indexOf(el), 1); }
+    this.children.splice(ref ? this.children.indexOf(ref) : this.children.length, 0, el);
+    el.parentNode = this;
+  }
+  remove() { ops.removes++; const s = this.parentNode.children; s.splice(s.indexOf(this), 1); this.parentNode = null; }
+  closest() { return wrap; }
+}
+const wrap = { scrollTop: 0, clientHeight: 720 };
+const tbody = new El();
+const document = { getElementById: () => tbody, createElement: () => new El() };
+let trades = [], totalTrades = 0;
+"""
+
+TABLE_RUN = r"""
+function timed(fn) { const before = { ...ops }, t0 = performance.now(); fn();
+  return { ms: performance.now() - t0, ops: Object.keys(ops).reduce((sum, k) => sum + ops[k] - before[k], 0) }; }
+const n = +process.argv[2], pairs = Object.keys(FLAGS), now = Date.now();
+trades = Array.from({ length: n }, (_, i) => {
+  const result = ['WIN', 'LOSS', 'PENDING'][i % 3];
+  const pnlPct = result === 'PENDING' ? null : (result === 'WIN' ? 12.5 : -8.25);
+  return { id: n - i, pair: pairs[i % pairs.length], dir: i % 2 ? 'BUY' : 'SELL', entry: 1.0842, tp: 1.0871, sl: 1.0821,
+           lev: 250, conf: 40 + i % 50, setup: 'bench', alloc: 10, result, pnlPct,
+           pnlAmt: pnlPct, capitalAfter: 100 + i % 97, time: new Date(now - i * 60000).toISOString() };
+});
+totalTrades = n;
+const out = { first: timed(renderTable), wheel: [], drag: [] };
+for (let k = 1; k <= 240; k++) { wrap.scrollTop = k * 120; out.wheel.push(timed(renderTable)); }
+const stride = Math.floor((n * ROW_HEIGHT - wrap.clientHeight) / 240);
+for (let k = 1; k <= 240; k++) { wrap.scrollTop = k * stride; out.drag.push(timed(renderTable)); }
+const mid = Math.floor(wrap.scrollTop / ROW_HEIGHT);
+trades[mid] = { ...trades[mid], result: 'WIN', pnlPct: 30 };
+out.patch = timed(renderTable);
+wrap.scrollTop = 0;
+renderTable();
+out.prepend = timed(() => { trades.unshift({ ...trades[0], id: n + 1 }); totalTrades++; renderTable(); });
+out.rebuild = timed(() => trades.map((t, i) => `<tr class="trade-row">${tradeRowHtml(t, totalTrades - i)}</tr>`).join(''));
+out.mounted = mountedRows.size;
+console.log(JSON.stringify(out));
+"""
+
+
+def _shell_js(start, end):
+    html = app.HTML
+    i = html.index(start)
+    return html[i:html.index(end, i)]
+
+
+@bench
+def bench_table(args):
+    """The SPA's windowed trade table, run under node: script time per frame while scrolling vs the old full rebuild."""
+    node = shutil.which("node")
+    if node is None:
+        print("[table] skipped (needs node on PATH)")
+        return
+    script = "\n".join([TABLE_DOM, _shell_js("const FLAGS = {", "};") + "};",
+                        _shell_js("// The journal can hold tens of thousands", "/* ══ EQUITY CHART"), TABLE_RUN])
+    with tempfile.NamedTemporaryFile("w", suffix=".js", encoding="utf-8") as f:
+        f.write(script)
+        f.flush()
+        out = json.loads(subprocess.run([node, f.name, str(args.n)], check=True,
+                                        capture_output=True, text=True).stdout)
+    print(f"[table:{args.n:,}]  (script time only: no layout or paint)")
+    for label, key in (("first render", "first"), ("patch one trade", "patch"), ("prepend a trade", "prepend")):
+        print(f"  {label:<34} {out[key]['ms']:9.2f} ms  {out[key]['ops']:6,} DOM writes")
+    for label, key in (("wheel, 120px a frame", "wheel"), ("scrollbar drag, whole journal", "drag")):
+        frames = [step["ms"] for step in out[key]]
+        writes = [step["ops"] for step in out[key]]
+        print(f"  {label:<34} p50 {_percentile(frames, 0.5):6.2f} ms  p95 {_percentile(frames, 0.95):6.2f} ms"
+              f"  max {max(frames):6.2f} ms  {_percentile(writes, 0.5)} DOM writes/frame (p50)")
+    print(f"  {'old full rebuild (markup only)':<34} {out['rebuild']['ms']:9.2f} ms  "
+          f"{args.n:,} rows for the browser to parse  ({out['mounted']} mounted now)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("which", nargs="*", help="benchmarks to run: " + ", ".join(sorted(BENCHES)))
+    parser.add_argument("-n", type=int, default=100_000, help="journal size (default 100k)")
+    parser.add_argument("--url", help="running server for the sse load generator")
+    parser.add_argument("--streams", type=int, default=500, help="open /api/stream connections (default 500)")
+    parser.add_argument("--events", type=int, default=20, help="trades to post during the sse run (default 20)")
+    parser.add_argument("--paths", type=int, default=100_000, help="equity paths for the ruin benchmark (default 100k)")
+    parser.add_argument("--trades", type=int, default=100, help="trades per ruin path (default 100)")
+    parser.add_argument("--seconds", type=float, default=5, help="how long the stress run lasts (default 5)")
+    args = parser.parse_args()
+    unknown = set(args.which) - set(BENCHES)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+    for name in args.which or sorted(BENCHES):
+        BENCHES[name](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Refresh the third-party assets the SPA serves from static/.
+
+    python vendor.py                    # download Chart.js and the fonts, then subset
+    python vendor.py --from ~/assets    # air-gapped: take the same files from a folder
+
+Chart.js comes from the npm tarball; the fonts are the upstream Google Fonts
+TTFs, cut down to Latin plus every character the shell actually uses, pinned
+to the weight range app.FONT_FACES declares and stored as woff2 next to their
+OFL licence. The app picks them up at import and serves them from immutable,
+digest-versioned URLs, so nothing is fetched from a CDN at runtime.
+
+Needs fontTools (``pip install fonttools brotli``); the app itself does not.
+"""
+
+import argparse, io, os, sys, tarfile
+import urllib.request
+
+os.environ.setdefault("MFX_STORAGE", "memory")   # keep app import from touching a real journal
+import app
+
+CHARTJS_VERSION = "4.4.0"
+CHARTJS_URL = f"https://registry.npmjs.org/chart.js/-/chart.js-{CHARTJS_VERSION}.tgz"
+CHARTJS_MEMBER = "package/dist/chart.umd.js"
+CHARTJS_LICENSE = "package/LICENSE.md"
+FONTS_URL = "https://github.com/google/fonts/raw/main/ofl/"
+
+# static/fonts file -> upstream path under FONTS_URL
+FONT_SOURCES = {
+    "bebas-neue.woff2": "bebasneue/BebasNeue-Regular.ttf",
+    "jetbrains-mono.woff2": "jetbrainsmono/JetBrainsMono[wght].ttf",
+    "syne.woff2": "syne/Syne[wght].ttf",
+}
+
+# Basic Latin, Latin-1, and the usual typographic punctuation
+LATIN = [*range(0x20, 0x7F), *range(0xA0, 0x100),
+         0x2013, 0x2014, 0x2018, 0x2019, 0x201C, 0x201D, 0x2022, 0x2026, 0x20AC, 0x2212]
+
+
+def fetch(url):
+    print(f"  GET {url}")
+    with urllib.request.urlopen(url, timeout=60) as resp:
+        return resp.read()
+
+
+def source(args, url, filename):
+    if args.source is None:
+        return fetch(url)
+    with open(os.path.join(args.source, filename), "rb") as f:
+        return f.read()
+
+
+def vendor_chartjs(args):
+    if args.source is None:
+        with tarfile.open(fileobj=io.BytesIO(fetch(CHARTJS_URL))) as tar:
+            body = tar.extractfile(CHARTJS_MEMBER).read()
+            license = tar.extractfile(CHARTJS_LICENSE).read()
+    else:
+        body = source(args, None, "chart.umd.js")
+        license = source(args, None, "chart.js.LICENSE.md")
+    write(args, "vendor/chart.umd.min.js", body)
+    write(args, "vendor/chart.js.LICENSE", license)
+
+
+def vendor_fonts(args):
+    from fontTools import subset, ttLib
+    from fontTools.varLib import instancer
+
+    used = {ord(c) for c in app.HTML if ord(c) > 0x7E}
+    weights = {filename: weight for _, weight, filename in app.FONT_FACES}
+    for filename, upstream in FONT_SOURCES.items():
+        font = ttLib.TTFont(io.BytesIO(source(args, FONTS_URL + upstream, os.path.basename(upstream))))
+        cmap = font.getBestCmap()
+        options = subset.Options()
+        options.layout_features = ["*"]
+        options.name_IDs = ["*"]
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(unicodes=[u for u in {*LATIN, *used} if u in cmap])
+        subsetter.subset(font)
+        if "fvar" in font:
+            low, _, high = weights[filename].partition(" ")
+            font = instancer.instantiateVariableFont(font, {"wght": (int(low), int(high or low))})
+        out = io.BytesIO()
+        font.flavor = "woff2"
+        font.save(out)
+        write(args, f"fonts/{filename}", out.getvalue())
+        family = os.path.dirname(upstream)
+        write(args, f"fonts/{os.path.splitext(filename)[0]}.LICENSE",
+              source(args, f"{FONTS_URL}{family}/OFL.txt", f"{family}.OFL.txt"))
+
+
+def write(args, name, body):
+    path = os.path.join(args.static, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(body)
+    print(f"  {name:28s} {len(body) / 1024:8.1f} kB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from", dest="source", help="folder holding chart.umd.js, chart.js.LICENSE.md, the upstream TTFs and <family>.OFL.txt")
+    parser.add_argument("--static", default=app.STATIC_DIR, help="where to write (default: the app's static/)")
+    parser.add_argument("--skip-fonts", action="store_true", help="only refresh Chart.js")
+    args = parser.parse_args()
+    vendor_chartjs(args)
+    if not args.skip_fonts:
+        vendor_fonts(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())